@@ -0,0 +1,486 @@
+import argparse
+import csv
+import hashlib
+import os
+import sqlite3
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "app"))
+from db import get_connection, initialize_db
+
+# Settings (kept in step with classify_bird.py)
+CONFIDENCE_THRESHOLD = 0.65
+REVIEW_THRESHOLD = 0.1
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "images")
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "model", "efficientnet_b7_backyard-birds.onnx")
+LABELS_PATH = os.path.join(os.path.dirname(__file__), "model", "class_labels.txt")
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "model", "prediction_cache.db")
+
+# Every worker holds its own EfficientNet-B7 session, and activations grow
+# with the batch size at 600x600, so the defaults stay small for the Pi
+WORKERS = 1
+BATCH_SIZE = 4
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Per-worker ONNX session, created once by init_worker()
+_session = None
+_input_name = None
+_fixed_batch = False
+
+# ---------- Cache store ----------
+# Softmax vectors are stored as float16 blobs keyed by (image hash, ONNX hash).
+# A model version is the ONNX hash plus its label list, so swapping in a new
+# class_labels.txt reuses the cached outputs but is tracked (and diffable) as
+# its own version. Label mapping, top-k and thresholds can all be changed
+# afterwards without re-running the model.
+
+def get_cache_connection(cache_path=CACHE_PATH):
+    conn = sqlite3.connect(cache_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS models (
+            version_hash TEXT PRIMARY KEY,
+            model_hash TEXT NOT NULL,
+            model_path TEXT NOT NULL,
+            labels TEXT NOT NULL,
+            created TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS predictions (
+            image_hash TEXT NOT NULL,
+            model_hash TEXT NOT NULL,
+            probs BLOB NOT NULL,
+            PRIMARY KEY (image_hash, model_hash)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS images (
+            filename TEXT PRIMARY KEY,
+            image_hash TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_model ON predictions (model_hash)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_images_hash ON images (image_hash)")
+    return conn
+
+def register_version(conn, model_hash, model_path, labels):
+    labels_text = "\n".join(labels)
+    version_hash = hashlib.sha256(f"{model_hash}\n{labels_text}".encode("utf-8")).hexdigest()
+    # Same version means same model bytes and labels, so an existing row is kept as is
+    conn.execute("""
+        INSERT OR IGNORE INTO models (version_hash, model_hash, model_path, labels)
+        VALUES (?, ?, ?, ?)
+    """, (version_hash, model_hash, os.path.abspath(model_path), labels_text))
+    conn.commit()
+    return version_hash
+
+def get_version(conn, version_hash):
+    """Return (model_hash, labels) for a cached model version."""
+    row = conn.execute(
+        "SELECT model_hash, labels FROM models WHERE version_hash = ?", (version_hash,)
+    ).fetchone()
+    if not row:
+        raise SystemExit(f"[ERROR] Model version {version_hash} is not in the cache.")
+    return row[0], row[1].split("\n")
+
+def resolve_version(conn, prefix):
+    rows = conn.execute(
+        "SELECT version_hash FROM models WHERE version_hash LIKE ?", (prefix + "%",)
+    ).fetchall()
+    if len(rows) != 1:
+        raise SystemExit(f"[ERROR] Model version '{prefix}' matches {len(rows)} cached versions.")
+    return rows[0][0]
+
+def load_predictions(conn, model_hash):
+    """Return {image_hash: probs} for every cached image of a model."""
+    cursor = conn.execute("""
+        SELECT image_hash, probs FROM predictions WHERE model_hash = ?
+    """, (model_hash,))
+    return {
+        image_hash: np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+        for image_hash, blob in cursor
+    }
+
+# ---------- Hashing ----------
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def hash_image(filename):
+    return filename, file_hash(os.path.join(IMAGE_DIR, filename))
+
+def image_hashes(conn, filenames, workers=1):
+    """Return {filename: image_hash} for the files that exist in images/.
+
+    Hashes are remembered per filename and only recomputed when the file's
+    size or mtime changes, so renamed and duplicate images still resolve by content.
+    """
+    known = {
+        filename: (image_hash, size, mtime_ns)
+        for filename, image_hash, size, mtime_ns in conn.execute(
+            "SELECT filename, image_hash, size, mtime_ns FROM images"
+        )
+    }
+    hashes, stale, stats = {}, [], {}
+    for filename in filenames:
+        try:
+            st = os.stat(os.path.join(IMAGE_DIR, filename))
+        except FileNotFoundError:
+            continue
+        stats[filename] = (st.st_size, st.st_mtime_ns)
+        entry = known.get(filename)
+        if entry and entry[1:] == stats[filename]:
+            hashes[filename] = entry[0]
+        else:
+            stale.append(filename)
+
+    if stale:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                fresh = list(pool.map(hash_image, stale, chunksize=64))
+        else:
+            fresh = [hash_image(filename) for filename in stale]
+        conn.executemany("""
+            INSERT OR REPLACE INTO images (filename, image_hash, size, mtime_ns)
+            VALUES (?, ?, ?, ?)
+        """, [(filename, image_hash) + stats[filename] for filename, image_hash in fresh])
+        conn.commit()
+        hashes.update(fresh)
+
+    return hashes
+
+def read_labels(labels_path):
+    with open(labels_path) as f:
+        return [line.strip() for line in f]
+
+# ---------- Inference ----------
+
+def preprocess_image(image_path):
+    img = Image.open(image_path).convert("RGB").resize((600, 600))
+    arr = np.array(img).astype(np.float32) / 255.0
+    arr = (arr - [0.485, 0.456, 0.406]) / [0.229, 0.224, 0.225]
+    return np.transpose(arr, (2, 0, 1)).astype(np.float32)
+
+def softmax(x):
+    e_x = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e_x / e_x.sum(axis=-1, keepdims=True)
+
+def init_worker(model_path, threads):
+    global _session, _input_name, _fixed_batch
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    _session = ort.InferenceSession(model_path, sess_options=options)
+    model_input = _session.get_inputs()[0]
+    _input_name = model_input.name
+    # Models exported with a static batch dimension only accept one image per run
+    _fixed_batch = model_input.shape[0] == 1
+
+def classify_batch(batch):
+    """Run one batch of (filename, image_hash) through the model in a worker."""
+    arrays, kept = [], []
+    for filename, image_hash in batch:
+        try:
+            arrays.append(preprocess_image(os.path.join(IMAGE_DIR, filename)))
+            kept.append((filename, image_hash))
+        except Exception as e:
+            print(f"[WARN] Could not load {filename}: {e}")
+
+    if not arrays:
+        return []
+
+    inputs = np.stack(arrays)
+    if _fixed_batch:
+        logits = np.concatenate([
+            _session.run(None, {_input_name: inputs[i:i + 1]})[0] for i in range(len(inputs))
+        ])
+    else:
+        logits = _session.run(None, {_input_name: inputs})[0]
+
+    probs = softmax(logits.reshape(len(kept), -1)).astype(np.float16)
+    return [(image_hash, p.tobytes()) for (_, image_hash), p in zip(kept, probs)]
+
+def list_images():
+    return sorted(
+        name for name in os.listdir(IMAGE_DIR)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+def verify_outputs(conn, version_hash, labels, blob):
+    """Drop a just-registered version whose label file doesn't fit the model."""
+    outputs = len(blob) // np.dtype(np.float16).itemsize
+    if outputs != len(labels):
+        conn.execute("DELETE FROM models WHERE version_hash = ?", (version_hash,))
+        conn.commit()
+        raise SystemExit(f"[ERROR] {len(labels)} labels but model has {outputs} outputs.")
+
+def run_model(args):
+    labels = read_labels(args.labels)
+    model_hash = file_hash(args.model)
+    conn = get_cache_connection(args.cache)
+    version_hash = register_version(conn, model_hash, args.model, labels)
+    print(f"[INFO] Model version {version_hash[:12]} (model {model_hash[:12]}, {len(labels)} labels)")
+
+    images = list_images()
+    # Hashing is light on memory, so it can use every core
+    hashes = image_hashes(conn, images, os.cpu_count() or 1)
+
+    cached = {}
+    for image_hash, blob in conn.execute(
+        "SELECT image_hash, probs FROM predictions WHERE model_hash = ?", (model_hash,)
+    ):
+        cached[image_hash] = blob
+    for blob in list(cached.values())[:1]:
+        verify_outputs(conn, version_hash, labels, blob)
+    # Identical files share one inference
+    todo = {}
+    for filename, image_hash in hashes.items():
+        if image_hash not in cached:
+            todo.setdefault(image_hash, filename)
+    todo = [(filename, image_hash) for image_hash, filename in todo.items()]
+    print(f"[INFO] {len(images)} images, {len(todo)} unique images to classify")
+
+    if not todo:
+        conn.close()
+        return
+
+    batches = [todo[i:i + args.batch_size] for i in range(0, len(todo), args.batch_size)]
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=init_worker,
+        initargs=(args.model, args.threads),
+    ) as pool:
+        for results in pool.map(classify_batch, batches):
+            # Check the label file against the real output size before caching anything
+            for _, blob in results[:1]:
+                try:
+                    verify_outputs(conn, version_hash, labels, blob)
+                except SystemExit:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+            conn.executemany("""
+                INSERT OR REPLACE INTO predictions (image_hash, probs, model_hash)
+                VALUES (?, ?, ?)
+            """, [row + (model_hash,) for row in results])
+            conn.commit()
+            done += len(results)
+            print(f"[CLASSIFY] {done}/{len(todo)}")
+
+    conn.close()
+    print(f"[INFO] Cached predictions for model version {version_hash[:12]}")
+
+# ---------- Reporting ----------
+
+def decide_status(species, confidence, confidence_threshold, review_threshold):
+    if species.strip().lower().replace(" ", "_") == "not_a_bird" or confidence < review_threshold:
+        return "not_a_bird"
+    return "accepted" if confidence >= confidence_threshold else "review"
+
+def check_labels(labels, probs):
+    if len(labels) != len(probs):
+        raise SystemExit(f"[ERROR] {len(labels)} labels but model has {len(probs)} outputs.")
+
+def load_version(conn, prefix, labels_path=None):
+    """Return (version_hash, labels, predictions) for a cached model version."""
+    version_hash = resolve_version(conn, prefix)
+    model_hash, labels = get_version(conn, version_hash)
+    if labels_path:
+        labels = read_labels(labels_path)
+    predictions = load_predictions(conn, model_hash)
+    for probs in list(predictions.values())[:1]:
+        check_labels(labels, probs)
+    return version_hash, labels, predictions
+
+def show_topk(args):
+    conn = get_cache_connection(args.cache)
+    _, labels, predictions = load_version(conn, args.version, args.labels)
+    hashes = image_hashes(conn, args.filenames or list_images())
+    conn.close()
+
+    for filename in args.filenames or sorted(hashes):
+        probs = predictions.get(hashes.get(filename))
+        if probs is None:
+            print(f"[WARN] No cached prediction for {filename}")
+            continue
+        top = np.argsort(probs)[::-1][:args.top_k]
+        ranked = ", ".join(f"{labels[i]} ({probs[i]:.2f})" for i in top)
+        print(f"{filename}: {ranked}")
+
+def apply_model(args):
+    """Rewrite visits from cached predictions, without touching the images."""
+    conn = get_cache_connection(args.cache)
+    _, labels, predictions = load_version(conn, args.version, args.labels)
+
+    initialize_db()  # adds the reviewed flag to older databases
+    with get_connection() as db:
+        # Rows still queued for classify_queue are left to it (thumbnail, alert, cleanup)
+        rows = db.execute("""
+            SELECT filename, species, status, reviewed FROM visits WHERE classified = 1
+        """).fetchall()
+        # Matched by content, so renamed and duplicate images pick up their prediction
+        hashes = image_hashes(conn, [row[0] for row in rows])
+        conn.close()
+
+        changes = Counter()
+        for filename, species, status, reviewed in rows:
+            if filename not in hashes:
+                changes["unmatched (image missing)"] += 1
+                continue
+            probs = predictions.get(hashes[filename])
+            if probs is None:
+                changes["unmatched (not classified by this model)"] += 1
+                continue
+            # Decisions made on /review or /edit are kept unless asked otherwise
+            if reviewed and not args.include_reviewed:
+                changes["skipped (reviewed)"] += 1
+                continue
+
+            prediction = int(np.argmax(probs))
+            new_species = labels[prediction]
+            new_confidence = round(float(probs[prediction]), 4)
+            new_status = decide_status(
+                new_species, new_confidence, args.confidence_threshold, args.review_threshold
+            )
+
+            if (new_species, new_status) == (species, status):
+                changes["unchanged"] += 1
+                continue
+            changes[f"{status} -> {new_status}"] += 1
+
+            if not args.dry_run:
+                db.execute("""
+                    UPDATE visits
+                    SET species = ?, confidence = ?, status = ?, classified = 1, reviewed = 0
+                    WHERE filename = ?
+                """, (new_species, new_confidence, new_status, filename))
+        db.commit()
+
+    for change, count in sorted(changes.items()):
+        print(f"{change}: {count}")
+    if args.dry_run:
+        print("[INFO] Dry run — visits table not modified.")
+
+def diff_models(args):
+    conn = get_cache_connection(args.cache)
+    _, old_labels, old_predictions = load_version(conn, args.old)
+    _, new_labels, new_predictions = load_version(conn, args.new)
+    # Name each image hash after a file that has (or had) that content
+    names = {}
+    for filename, image_hash in conn.execute("SELECT filename, image_hash FROM images ORDER BY filename"):
+        names.setdefault(image_hash, filename)
+    conn.close()
+
+    # Compare by content hash, so renamed or re-imported images still line up
+    changed = []
+    old_counts, new_counts = Counter(), Counter()
+    compared = 0
+    for image_hash in sorted(new_predictions, key=lambda h: names.get(h, h)):
+        if image_hash not in old_predictions:
+            continue
+        compared += 1
+        old_probs, new_probs = old_predictions[image_hash], new_predictions[image_hash]
+        old_i, new_i = int(np.argmax(old_probs)), int(np.argmax(new_probs))
+        old_species, new_species = old_labels[old_i], new_labels[new_i]
+        old_counts[old_species] += 1
+        new_counts[new_species] += 1
+        if old_species != new_species:
+            filename = names.get(image_hash, image_hash[:12])
+            changed.append((filename, old_species, float(old_probs[old_i]), new_species, float(new_probs[new_i])))
+
+    if not compared:
+        print("[INFO] No images cached under both model versions.")
+        return
+
+    agreement = 1 - len(changed) / compared
+    print(f"Compared {compared} images: {len(changed)} changed top-1 ({agreement:.1%} agreement)")
+
+    print("\nSpecies count changes:")
+    for species in sorted(set(old_counts) | set(new_counts)):
+        delta = new_counts[species] - old_counts[species]
+        if delta:
+            print(f"  {species}: {old_counts[species]} -> {new_counts[species]} ({delta:+d})")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["filename", "old_species", "old_confidence", "new_species", "new_confidence"])
+            writer.writerows(changed)
+        print(f"\n[INFO] Wrote {len(changed)} changed predictions to {args.csv}")
+    else:
+        print("\nChanged predictions:")
+        for filename, old_species, old_conf, new_species, new_conf in changed[:args.limit]:
+            print(f"  {filename}: {old_species} ({old_conf:.2f}) -> {new_species} ({new_conf:.2f})")
+        if len(changed) > args.limit:
+            print(f"  ... {len(changed) - args.limit} more (use --csv for the full list)")
+
+def list_models(args):
+    conn = get_cache_connection(args.cache)
+    cursor = conn.execute("""
+        SELECT m.version_hash, m.model_hash, m.model_path, m.created,
+               (SELECT COUNT(*) FROM predictions p WHERE p.model_hash = m.model_hash)
+        FROM models m
+        ORDER BY m.created
+    """)
+    for version_hash, model_hash, model_path, created, count in cursor:
+        print(f"{version_hash[:12]}  model {model_hash[:12]}  {created}  {count:>6} images  {model_path}")
+    conn.close()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bulk re-classification with a cached prediction store.")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Prediction cache database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Classify every image in images/ not yet cached for this model")
+    run.add_argument("--model", default=MODEL_PATH)
+    run.add_argument("--labels", default=LABELS_PATH)
+    run.add_argument("--workers", type=int, default=WORKERS, help="Inference processes, each loading its own model")
+    run.add_argument("--threads", type=int, default=0, help="ONNX threads per worker (default: onnxruntime's choice)")
+    run.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    run.set_defaults(func=run_model)
+
+    models = sub.add_parser("models", help="List cached model versions")
+    models.set_defaults(func=list_models)
+
+    topk = sub.add_parser("topk", help="Show top-k cached predictions")
+    topk.add_argument("version", help="Model version hash (or unique prefix)")
+    topk.add_argument("filenames", nargs="*")
+    topk.add_argument("-k", "--top-k", type=int, default=3)
+    topk.add_argument("--labels", help="Override the labels stored with the model")
+    topk.set_defaults(func=show_topk)
+
+    apply = sub.add_parser("apply", help="Update visits from cached predictions")
+    apply.add_argument("version", help="Model version hash (or unique prefix)")
+    apply.add_argument("--labels", help="Override the labels stored with the model")
+    apply.add_argument("--confidence-threshold", type=float, default=CONFIDENCE_THRESHOLD)
+    apply.add_argument("--review-threshold", type=float, default=REVIEW_THRESHOLD)
+    apply.add_argument(
+        "--include-reviewed", action="store_true",
+        help="Also overwrite species and statuses set by hand on /review or /edit"
+    )
+    apply.add_argument("--dry-run", action="store_true")
+    apply.set_defaults(func=apply_model)
+
+    diff = sub.add_parser("diff", help="Report prediction changes between two model versions")
+    diff.add_argument("old", help="Old model version hash (or unique prefix)")
+    diff.add_argument("new", help="New model version hash (or unique prefix)")
+    diff.add_argument("--limit", type=int, default=50)
+    diff.add_argument("--csv", help="Write all changed predictions to a CSV file")
+    diff.set_defaults(func=diff_models)
+
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.func(args)
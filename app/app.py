@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
+from flask import Flask, Response, render_template, request, redirect, url_for, send_from_directory
 import os
 import csv
 from datetime import datetime
@@ -8,11 +8,13 @@ import seaborn as sns
 import re
 import requests
 from db import (
+    initialize_db,
     get_connection,
     update_status,
     delete_visit,
     add_visit,
 )
+from events import EventBroker, get_today_summary, stream
 
 app = Flask(__name__, static_folder="static")
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
@@ -21,6 +23,7 @@ CLASS_LABEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "ai"
 THUMBNAIL_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "thumbnails")
 IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "images")
 os.makedirs(IMAGE_DIR, exist_ok=True)
+initialize_db()
 
 # Load species label mapping from CSV
 SPECIES_LOOKUP = {}
@@ -86,6 +89,9 @@ def fetch_current_weather(lat=39.7392, lon=-104.9903, timezone="auto"):  # Defau
         print(f"[WARN] Weather fetch failed: {e}")
         return "Weather unavailable"
 
+# Live dashboard updates, fed by a single watcher thread per process
+broker = EventBroker(format_species_name)
+
 @app.route("/")
 def index():
     page = request.args.get("page", default=1, type=int)
@@ -115,42 +121,8 @@ def index():
         """)
         total_count = cursor.fetchone()[0]
 
-        # Today's visit count
-        cursor = conn.execute("""
-            SELECT COUNT(*) FROM visits
-            WHERE status = 'accepted'
-              AND DATE(timestamp) = ?
-              AND LOWER(species) != 'not_a_bird'
-        """, (today,))
-        todays_count = cursor.fetchone()[0]
-
-        # Most recent visit today
-        cursor = conn.execute("""
-            SELECT * FROM visits
-            WHERE status = 'accepted'
-              AND DATE(timestamp) = ?
-              AND LOWER(species) != 'not_a_bird'
-            ORDER BY timestamp DESC
-            LIMIT 1
-        """, (today,))
-        recent_row = cursor.fetchone()
-        most_recent = dict(zip([col[0] for col in cursor.description], recent_row)) if recent_row else None
-        if most_recent:
-            most_recent["species"] = format_species_name(most_recent["species"])
-
-        # Most frequent species today
-        cursor = conn.execute("""
-            SELECT species, COUNT(*) as count
-            FROM visits
-            WHERE status = 'accepted'
-              AND DATE(timestamp) = ?
-              AND LOWER(species) != 'not_a_bird'
-            GROUP BY species
-            ORDER BY count DESC
-            LIMIT 1
-        """, (today,))
-        freq_row = cursor.fetchone()
-        most_frequent_species = format_species_name(freq_row[0]) if freq_row else None
+        # Today's counters (also pushed live over /events)
+        summary = get_today_summary(conn, format_species_name)
 
     has_next = (offset + per_page) < total_count
     has_prev = page > 1
@@ -162,12 +134,20 @@ def index():
         has_next=has_next,
         has_prev=has_prev,
         date=today.strftime("%A, %B %d"),
-        todays_count=todays_count,
-        most_recent=most_recent,
-        most_frequent_species=most_frequent_species,
+        today=today.isoformat(),
+        todays_count=summary["todays_count"],
+        most_recent=summary["most_recent"],
+        most_frequent_species=summary["most_frequent_species"],
         weather=fetch_current_weather()
     )
 
+@app.route("/events")
+def event_stream():
+    response = Response(stream(broker), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # disable nginx buffering
+    return response
+
 @app.route("/review")
 def review():
     page = request.args.get("page", default=1, type=int)
@@ -302,7 +282,7 @@ def edit_species(filename):
         with get_connection() as conn:
             conn.execute("""
                 UPDATE visits
-                SET species = ?, confidence = 0.0, classified = 1
+                SET species = ?, confidence = 0.0, classified = 1, reviewed = 1
                 WHERE filename = ?
             """, (new_species, filename))
             conn.commit()
@@ -315,4 +295,5 @@ def edit_species(filename):
     return render_template("edit.html", filename=filename, species_options=class_labels)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    # Development server; use gunicorn.conf.py for production serving
+    app.run(host="0.0.0.0", port=5000, threaded=True)
@@ -2,7 +2,8 @@ import sqlite3
 from datetime import datetime
 import os
 
-DB_FILE = os.path.join(os.path.dirname(__file__), "birdwatcher.db")
+DEFAULT_DB_FILE = os.path.join(os.path.dirname(__file__), "birdwatcher.db")
+DB_FILE = os.getenv("BIRDWATCHER_DB", DEFAULT_DB_FILE)
 
 def get_connection():
     return sqlite3.connect(DB_FILE)
@@ -18,9 +19,23 @@ def initialize_db():
             species TEXT,
             confidence REAL,
             status TEXT CHECK(status IN ('accepted', 'review', 'not_a_bird')) NOT NULL,
-            classified BOOLEAN NOT NULL DEFAULT 0
+            classified BOOLEAN NOT NULL DEFAULT 0,
+            reviewed BOOLEAN NOT NULL DEFAULT 0
         )
         """)
+
+        # Older databases predate the reviewed flag; add it and mark rows only a
+        # person could have produced: not_a_bird (the classifier deletes those),
+        # accepted below the classifier's 0.65 threshold, and hand edits (confidence 0.0)
+        columns = [row[1] for row in c.execute("PRAGMA table_info(visits)")]
+        if "reviewed" not in columns:
+            c.execute("ALTER TABLE visits ADD COLUMN reviewed BOOLEAN NOT NULL DEFAULT 0")
+            c.execute("""
+            UPDATE visits SET reviewed = 1
+            WHERE status = 'not_a_bird'
+               OR (status = 'accepted' AND confidence < 0.65)
+               OR confidence = 0.0
+            """)
         conn.commit()
 
 def add_visit(filename, timestamp, species, confidence, status, classified=False):
@@ -33,10 +48,13 @@ def add_visit(filename, timestamp, species, confidence, status, classified=False
         """, (filename, timestamp, species, confidence, status, int(classified)))
         conn.commit()
 
-def update_status(filename, new_status):
+def update_status(filename, new_status, reviewed=True):
     with get_connection() as conn:
         c = conn.cursor()
-        c.execute("UPDATE visits SET status = ? WHERE filename = ?", (new_status, filename))
+        c.execute(
+            "UPDATE visits SET status = ?, reviewed = ? WHERE filename = ?",
+            (new_status, int(reviewed), filename)
+        )
         conn.commit()
 
 def delete_visit(filename):
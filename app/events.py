@@ -0,0 +1,166 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from db import get_connection
+
+POLL_INTERVAL = 1.0        # seconds between PRAGMA data_version checks
+KEEPALIVE_INTERVAL = 15    # seconds between SSE comments on idle streams
+SUBSCRIBER_QUEUE_SIZE = 100
+CLOSE = object()           # queued for a subscriber that fell too far behind
+
+# ---------- Broker ----------
+# One watcher thread per web process notices commits from the classifier,
+# queries the new rows once and fans the result out to every open dashboard.
+
+class EventBroker:
+    def __init__(self, format_species):
+        self.format_species = format_species
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.summary = None
+
+    def subscribe(self):
+        # One spare slot so there is always room for CLOSE
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE + 1)
+        with self._lock:
+            self._subscribers.add(q)
+            # Started lazily, so importing app.py (e.g. from classify_bird.py) spawns nothing
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="visit-watcher", daemon=True)
+                self._watcher.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event, data):
+        message = format_sse(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        # Only the watcher thread publishes, so the size check cannot race another put
+        for q in subscribers:
+            if q.qsize() >= SUBSCRIBER_QUEUE_SIZE:
+                # Slow client: end its stream so EventSource reconnects with a fresh snapshot
+                self.unsubscribe(q)
+                q.put_nowait(CLOSE)
+            else:
+                q.put_nowait(message)
+
+    def _watch(self):
+        conn = get_connection()
+        last_version = None
+        last_id = None
+
+        while True:
+            try:
+                # Loaded inside the retry loop, so a locked or not yet initialized
+                # database at startup doesn't kill the watcher for good
+                if last_id is None:
+                    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM visits").fetchone()[0]
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                changed = version != last_version
+                if changed:
+                    last_version = version
+                    cursor = conn.execute("""
+                        SELECT * FROM visits
+                        WHERE id > ?
+                        ORDER BY id ASC
+                    """, (last_id,))
+                    rows = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
+                    if rows:
+                        last_id = rows[-1]["id"]
+                    for row in rows:
+                        if row["status"] != "accepted" or (row["species"] or "").lower() == "not_a_bird":
+                            continue
+                        row["species"] = self.format_species(row["species"])
+                        self.publish("visit", row)
+
+                # Also roll the counters over at midnight, even if nothing was committed
+                rolled_over = self.summary is not None and self.summary["date"] != datetime.now().date().isoformat()
+                if changed or rolled_over:
+                    summary = get_today_summary(conn, self.format_species)
+                    if summary != self.summary:
+                        self.summary = summary
+                        self.publish("summary", summary)
+            except Exception as e:
+                print(f"[WARN] Visit watcher failed: {e}")
+            time.sleep(POLL_INTERVAL)
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def get_today_summary(conn, format_species):
+    """Today's counters shown in the dashboard header."""
+    today = datetime.now().date()
+
+    cursor = conn.execute("""
+        SELECT COUNT(*) FROM visits
+        WHERE status = 'accepted'
+          AND DATE(timestamp) = ?
+          AND LOWER(species) != 'not_a_bird'
+    """, (today,))
+    todays_count = cursor.fetchone()[0]
+
+    cursor = conn.execute("""
+        SELECT * FROM visits
+        WHERE status = 'accepted'
+          AND DATE(timestamp) = ?
+          AND LOWER(species) != 'not_a_bird'
+        ORDER BY timestamp DESC
+        LIMIT 1
+    """, (today,))
+    recent_row = cursor.fetchone()
+    most_recent = dict(zip([col[0] for col in cursor.description], recent_row)) if recent_row else None
+    if most_recent:
+        most_recent["species"] = format_species(most_recent["species"])
+
+    cursor = conn.execute("""
+        SELECT species, COUNT(*) as count
+        FROM visits
+        WHERE status = 'accepted'
+          AND DATE(timestamp) = ?
+          AND LOWER(species) != 'not_a_bird'
+        GROUP BY species
+        ORDER BY count DESC
+        LIMIT 1
+    """, (today,))
+    freq_row = cursor.fetchone()
+    most_frequent_species = format_species(freq_row[0]) if freq_row else None
+
+    return {
+        "date": today.isoformat(),
+        "todays_count": todays_count,
+        "most_recent": most_recent,
+        "most_frequent_species": most_frequent_species,
+    }
+
+def stream(broker):
+    """Generator backing the /events SSE response."""
+    # Subscribe before taking the snapshot, so no update can fall in between;
+    # at worst the client sees the same summary twice
+    q = broker.subscribe()
+    summary = broker.summary
+    try:
+        yield "retry: 5000\n\n"
+        if summary is not None:
+            yield format_sse("summary", summary)
+        while True:
+            try:
+                message = q.get(timeout=KEEPALIVE_INTERVAL)
+            except queue.Empty:
+                # Keeps proxies from closing the stream and surfaces dead clients
+                yield ": keepalive\n\n"
+                continue
+            if message is CLOSE:
+                return
+            yield message
+    finally:
+        broker.unsubscribe(q)
@@ -0,0 +1,23 @@
+# gunicorn.conf.py
+# Production serving: gunicorn -c gunicorn.conf.py app:app (run from app/)
+import os
+
+bind = os.getenv("BIRDWATCHER_BIND", "0.0.0.0:5000")
+
+# Async workers: each open /events stream is a cheap greenlet rather than a
+# thread, so live dashboards don't starve page requests. Every worker accepts
+# up to worker_connections at once (streams and page loads together); beyond
+# workers * worker_connections, new connections wait in the listen backlog
+# and time out on the client if nothing frees up.
+worker_class = "gevent"
+workers = int(os.getenv("BIRDWATCHER_WORKERS", "2"))
+worker_connections = int(os.getenv("BIRDWATCHER_CONNECTIONS", "500"))
+
+# SSE streams are long-lived; async workers heartbeat independently of
+# requests, so open streams do not trip the worker timeout.
+timeout = int(os.getenv("BIRDWATCHER_TIMEOUT", "60"))
+graceful_timeout = 10
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
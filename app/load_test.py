@@ -0,0 +1,126 @@
+# load_test.py
+# Opens many concurrent dashboard clients on /events, commits test visits
+# straight to the database (as the classifier would) and reports how long
+# the server took to push them to every client.
+#
+# Runs against a scratch database only; start the server on the same file:
+#   BIRDWATCHER_DB=/tmp/loadtest.db gunicorn -c gunicorn.conf.py app:app
+#   python load_test.py --db /tmp/loadtest.db --clients 200
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+import requests
+import db
+
+TEST_PREFIX = "loadtest_"
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def run_client(url, connected, received, errors, dropped, stop):
+    released = False
+    try:
+        with requests.get(url, stream=True, timeout=(5, 30)) as resp:
+            resp.raise_for_status()
+            connected.release()
+            released = True
+            event = None
+            for line in resp.iter_lines(decode_unicode=True):
+                if stop.is_set():
+                    break
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: ") and event == "visit" and TEST_PREFIX in line:
+                    # Filename is the only test-specific value in the payload
+                    filename = line.split(TEST_PREFIX, 1)[1].split('"', 1)[0]
+                    received.append((TEST_PREFIX + filename, time.perf_counter()))
+                elif not line:
+                    event = None
+    except Exception as e:
+        if released:
+            dropped.append(str(e))
+        else:
+            errors.append(str(e))
+            connected.release()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /events live feed.")
+    parser.add_argument("--db", required=True, help="Scratch database the server under test is using")
+    parser.add_argument("--url", default="http://localhost:5000/events")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--visits", type=int, default=5, help="Test visits to commit")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between visits")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.db) == os.path.abspath(db.DEFAULT_DB_FILE):
+        parser.error("refusing to write test visits into the live birdwatcher.db")
+    db.DB_FILE = args.db
+    db.initialize_db()
+
+    connected = threading.Semaphore(0)
+    stop = threading.Event()
+    errors, dropped = [], []
+    received_by_client = [[] for _ in range(args.clients)]
+
+    print(f"[INFO] Opening {args.clients} clients on {args.url}")
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(args.url, connected, received_by_client[i], errors, dropped, stop),
+            daemon=True,
+        )
+        for i in range(args.clients)
+    ]
+    for t in threads:
+        t.start()
+    for _ in threads:
+        connected.acquire()
+    print(f"[INFO] {args.clients - len(errors)} clients connected in {time.perf_counter() - start:.2f}s")
+
+    sent = {}
+    try:
+        for i in range(args.visits):
+            filename = f"{TEST_PREFIX}{int(time.time())}_{i}.jpg"
+            sent[filename] = time.perf_counter()
+            db.add_visit(
+                filename=filename,
+                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                species="Load Test",
+                confidence=1.0,
+                status="accepted",
+                classified=True
+            )
+            time.sleep(args.interval)
+        # Give the last visit time to reach everyone
+        time.sleep(max(args.interval, 3))
+    finally:
+        stop.set()
+        for filename in sent:
+            db.delete_visit(filename)
+
+    latencies = [
+        received_at - sent[filename]
+        for received in received_by_client
+        for filename, received_at in received
+        if filename in sent
+    ]
+    expected = len(sent) * (args.clients - len(errors))
+
+    print(f"Delivered {len(latencies)}/{expected} events")
+    if latencies:
+        print(
+            f"Latency p50 {percentile(latencies, 50):.3f}s  "
+            f"p95 {percentile(latencies, 95):.3f}s  "
+            f"max {max(latencies):.3f}s"
+        )
+    if errors:
+        print(f"[WARN] {len(errors)} clients failed to connect, e.g. {errors[0]}")
+    if dropped:
+        print(f"[WARN] {len(dropped)} streams dropped mid-test, e.g. {dropped[0]}")
+
+if __name__ == "__main__":
+    main()
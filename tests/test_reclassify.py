@@ -0,0 +1,83 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "ai"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "app"))
+import db
+import reclassify
+
+LABELS = ["robin", "finch", "not_a_bird"]
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """Scratch visits DB, prediction cache and images/ with one cached model version."""
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "birdwatcher.db"))
+    monkeypatch.setattr(reclassify, "IMAGE_DIR", str(image_dir))
+    db.initialize_db()
+
+    cache = str(tmp_path / "cache.db")
+    conn = reclassify.get_cache_connection(cache)
+    version = reclassify.register_version(conn, "model", "model.onnx", LABELS)
+    conn.close()
+
+    def add_image(filename, probs):
+        (image_dir / filename).write_bytes(filename.encode())
+        conn = reclassify.get_cache_connection(cache)
+        image_hash = reclassify.image_hashes(conn, [filename])[filename]
+        conn.execute(
+            "INSERT INTO predictions (image_hash, model_hash, probs) VALUES (?, ?, ?)",
+            (image_hash, "model", np.array(probs, dtype=np.float16).tobytes())
+        )
+        conn.commit()
+        conn.close()
+
+    def apply(*extra):
+        args = reclassify.build_parser().parse_args(["--cache", cache, "apply", version[:12], *extra])
+        args.func(args)
+
+    return add_image, apply
+
+def get_visit(filename):
+    with db.get_connection() as conn:
+        return conn.execute(
+            "SELECT species, status, classified, reviewed FROM visits WHERE filename = ?", (filename,)
+        ).fetchone()
+
+def test_apply_keeps_review_decisions(env):
+    add_image, apply = env
+    # The model is unsure about both; a person settled them on /review
+    add_image("good.jpg", [0.4, 0.3, 0.3])
+    add_image("junk.jpg", [0.4, 0.3, 0.3])
+    db.add_visit("good.jpg", "2025-05-01 08:00:00", "robin", 0.4, "review", classified=True)
+    db.add_visit("junk.jpg", "2025-05-01 08:01:00", "robin", 0.4, "review", classified=True)
+    db.update_status("good.jpg", "accepted")
+    db.update_status("junk.jpg", "not_a_bird")
+
+    apply()
+    assert get_visit("good.jpg")[:2] == ("robin", "accepted")
+    assert get_visit("junk.jpg")[:2] == ("robin", "not_a_bird")
+
+    apply("--include-reviewed")
+    assert get_visit("good.jpg") == ("robin", "review", 1, 0)
+    assert get_visit("junk.jpg") == ("robin", "review", 1, 0)
+
+def test_apply_updates_unreviewed_visits(env):
+    add_image, apply = env
+    add_image("bird.jpg", [0.1, 0.9, 0.0])
+    db.add_visit("bird.jpg", "2025-05-01 08:00:00", "robin", 0.5, "review", classified=True)
+
+    apply()
+    assert get_visit("bird.jpg") == ("finch", "accepted", 1, 0)
+
+def test_apply_skips_unclassified_visits(env):
+    add_image, apply = env
+    # Saved by the detector, not yet processed by classify_queue
+    add_image("queued.jpg", [0.0, 1.0, 0.0])
+    db.add_visit("queued.jpg", "2025-05-01 08:00:00", None, 0.8, "review", classified=False)
+
+    apply()
+    assert get_visit("queued.jpg") == (None, "review", 0, 0)